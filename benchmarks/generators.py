@@ -0,0 +1,111 @@
+"""Генераторы больших синтетических входных данных для бенчмарков."""
+import os
+import random
+import string
+import subprocess
+
+
+def identifier(index):
+    """Возвращает уникальное имя из букв a-z (IDENTIFIER_REGEX не допускает цифр)."""
+    letters = string.ascii_lowercase
+    name = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        name = letters[remainder] + name
+    return name
+
+
+def generate_filesystem(root, entries, files_per_dir=50, fanout=8):
+    """Создаёт в root дерево каталогов примерно из entries файлов и каталогов.
+
+    Возвращает список относительных путей созданных каталогов.
+    """
+    directories = [""]
+    created = 0
+    queue = [""]
+    while created < entries:
+        parent = queue.pop(0)
+        for _ in range(fanout):
+            if created >= entries:
+                break
+            relative = os.path.join(parent, f"dir_{created}")
+            os.makedirs(os.path.join(root, relative))
+            directories.append(relative)
+            queue.append(relative)
+            created += 1
+            for _ in range(min(files_per_dir, entries - created)):
+                with open(os.path.join(root, relative, f"file_{created}.log"), "w") as f:
+                    f.write("entry\n")
+                created += 1
+    return directories
+
+
+def generate_dependency_universe(packages, levels=8, max_dependencies=4, seed=0):
+    """Строит словарь пакет -> список зависимостей.
+
+    Пакеты разбиты на уровни, и зависимости ведут только на следующий уровень,
+    поэтому граф ациклический, а глубина рекурсии ограничена числом уровней.
+    """
+    rng = random.Random(seed)
+    names = [f"pkg{i}" for i in range(packages)]
+    per_level = max(packages // levels, 1)
+    universe = {}
+    for i, name in enumerate(names):
+        next_level = names[(i // per_level + 1) * per_level:(i // per_level + 2) * per_level]
+        count = min(rng.randint(0, max_dependencies), len(next_level))
+        universe[name] = rng.sample(next_level, count)
+    return universe
+
+
+def fake_apk(universe):
+    """Возвращает замену subprocess.run, отвечающую как `apk info -R` по словарю universe."""
+    def run(args, **kwargs):
+        package = args[-1]
+        if package not in universe:
+            return subprocess.CompletedProcess(args, 1, "", f"{package}: not found")
+        lines = [f"{package} depends on:"] + universe[package]
+        return subprocess.CompletedProcess(args, 0, "\n".join(lines) + "\n", "")
+    return run
+
+
+def generate_config(constants, tables, keys_per_table=20, servers=0, seed=0):
+    """Создаёт текст конфигурации с constants объявлениями let, tables таблицами
+    и массивом из servers однородных таблиц [[servers]] с выражениями в полях.
+    """
+    rng = random.Random(seed)
+    lines = ["{- сгенерированная конфигурация -}"]
+    names = [f"c_{identifier(i)}" for i in range(constants)]
+    for i, name in enumerate(names):
+        if i and i % 3 == 0:
+            lines.append(f"let {name} = |{names[i - 1]} + {rng.randint(1, 100)}|")
+        elif i and i % 3 == 1:
+            lines.append(f"let {name} = |max({names[i - 1]}, {names[rng.randrange(i)]}) - 1|")
+        else:
+            lines.append(f"let {name} = {rng.randint(0, 1000)}")
+
+    for t in range(tables):
+        lines.append("")
+        lines.append(f"{{- таблица {t} -}}")
+        lines.append(f"[t_{identifier(t)}]")
+        for k in range(keys_per_table):
+            key = f"k_{identifier(k)}"
+            kind = k % 4
+            if kind == 0:
+                lines.append(f'{key} = "value {t} {k}"')
+            elif kind == 1:
+                lines.append(f"{key} = {rng.randint(0, 100000)}")
+            elif kind == 2:
+                lines.append(f'{key} = "|{rng.choice(names)} + {rng.choice(names)}|"')
+            else:
+                lines.append(f"{key} = [1, 2, 3]")
+
+    for s in range(servers):
+        lines.append("")
+        lines.append("[[servers]]")
+        lines.append(f'name = "server {s}"')
+        lines.append(f'port = "|{names[0]} + 1|"')
+        lines.append(f'admin_port = "|max({names[0]}, {names[-1]}) + 2|"')
+        lines.append(f'workers = "|{names[s % min(len(names), 8)]} - 1|"')
+        lines.append(f"weight = {s % 10}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import tempfile
+import unittest
+
+import run_benchmarks
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_compare_detects_regressions(self):
+        baseline = {"config": {"throughput": 100.0, "p95_ms": 10.0, "peak_memory_kb": 1000}}
+        results = {"config": {"throughput": 70.0, "p95_ms": 50.0, "peak_memory_kb": 2000}}
+
+        regressions = run_benchmarks.compare(results, baseline, 0.25)
+
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith("config.throughput"))
+        self.assertTrue(regressions[1].startswith("config.peak_memory_kb"))
+
+    def test_compare_ignores_improvements(self):
+        baseline = {"config": {"throughput": 100.0, "p50_ms": 10.0}}
+        results = {"config": {"throughput": 500.0, "p50_ms": 1.0}}
+
+        self.assertEqual(run_benchmarks.compare(results, baseline, 0.25), [])
+
+    def test_compare_reports_missing_benchmark(self):
+        results = {"dependencies": {"throughput": 1.0}}
+
+        self.assertEqual(run_benchmarks.compare(results, {}, 0.25), ["dependencies: нет базовых значений"])
+
+    def test_missing_baseline_fails(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "baseline.json")
+            args = ["--scale", "0.001", "--only", "config", "--baseline", path]
+
+            self.assertEqual(run_benchmarks.main(args), 1)
+
+    def test_save_and_check_baseline(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "baseline.json")
+            args = ["--scale", "0.001", "--only", "config", "--baseline", path, "--rounds", "1"]
+
+            self.assertEqual(run_benchmarks.main(args + ["--save-baseline"]), 0)
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+            self.assertIn("throughput", saved["scale=0.001"]["config"])
+
+            self.assertEqual(run_benchmarks.main(args + ["--threshold", "1000"]), 0)
+
+    def test_peak_memory_covers_only_the_call(self):
+        peak = run_benchmarks.peak_memory(lambda: bytearray(4 * 1024 * 1024))
+
+        self.assertGreaterEqual(peak, 4 * 1024)
+        self.assertLess(peak, 8 * 1024)
+
+    @unittest.skipUnless(os.path.isdir(os.path.join(run_benchmarks.REPO_DIR, ".git")), "нужен git-репозиторий")
+    def test_against_reference_commit(self):
+        head = subprocess.run(["git", "-C", run_benchmarks.REPO_DIR, "rev-parse", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+        args = ["--scale", "0.001", "--only", "config", "--rounds", "1", "--threshold", "1000"]
+
+        self.assertEqual(run_benchmarks.main(args + ["--against", head]), 0)
+        self.assertEqual(run_benchmarks.main(args + ["--against", "no-such-ref"]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
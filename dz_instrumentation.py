@@ -0,0 +1,256 @@
+"""Общие средства замера времени для ShellEmulator, DependencyVisualizer и ConfigProcessor.
+
+По умолчанию выключено: span() возвращает общий пустой контекст, а count()
+сразу выходит, поэтому обвязка горячих путей почти ничего не стоит.
+
+Включение:
+    INSTRUMENTATION_TRACE=trace.json  — собирать интервалы и счётчики и при выходе
+                                        записать их в формате Chrome trace
+                                        (chrome://tracing, Perfetto);
+    INSTRUMENTATION_PROFILE=1         — дополнительно снимать cProfile и tracemalloc
+                                        (результаты пишутся рядом с trace-файлом).
+Из кода то же самое делают enable(), start_capture() и dump().
+"""
+import atexit
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+_enabled = False
+_events = []
+_counters = {}
+_lock = threading.Lock()
+_profiler = None
+_memory_snapshot = None
+# Состояние до start_capture(), которое восстанавливает stop_capture()
+_capture_state = None
+
+
+class _NullSpan:
+    """Пустой контекст, который используется, когда замеры выключены."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """Интервал, записываемый как событие 'X' (complete event) Chrome trace."""
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        event = {
+            "name": self.name,
+            "ph": "X",
+            "ts": self.start / 1000,
+            "dur": (end - self.start) / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if self.args:
+            event["args"] = self.args
+        if exc_type is not None:
+            event.setdefault("args", {})["error"] = exc_type.__name__
+        with _lock:
+            _events.append(event)
+        return False
+
+
+def enable():
+    """Включает сбор интервалов и счётчиков."""
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """Выключает сбор; уже собранные данные сохраняются до reset()."""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Очищает собранные интервалы, счётчики и результаты профилирования."""
+    global _memory_snapshot
+    with _lock:
+        _events.clear()
+        _counters.clear()
+    _memory_snapshot = None
+
+
+def span(name, **args):
+    """Контекстный менеджер, замеряющий время выполнения блока."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def traced(name=None):
+    """Декоратор: оборачивает каждый вызов функции в span()."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(span_name, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1):
+    """Увеличивает счётчик name на value."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def counters():
+    """Возвращает копию текущих значений счётчиков."""
+    with _lock:
+        return dict(_counters)
+
+
+def events():
+    """Возвращает копию записанных событий trace."""
+    with _lock:
+        return list(_events)
+
+
+def start_capture(memory=True):
+    """Запускает cProfile и, если memory, tracemalloc. Включает сбор интервалов.
+
+    stop_capture() возвращает сбор и tracemalloc в прежнее состояние.
+    """
+    global _profiler, _capture_state, _memory_snapshot
+    _memory_snapshot = None
+    starts_tracemalloc = memory and not tracemalloc.is_tracing()
+    if _capture_state is None:
+        _capture_state = {"enabled": _enabled, "memory": memory, "started_tracemalloc": starts_tracemalloc}
+    else:
+        # Вложенный вызов может запросить память, которую внешний не запрашивал
+        _capture_state["memory"] = _capture_state["memory"] or memory
+        _capture_state["started_tracemalloc"] = _capture_state["started_tracemalloc"] or starts_tracemalloc
+    enable()
+    if _profiler is None:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def stop_capture():
+    """Останавливает профилировщики; возвращает (pstats.Stats | None, снимок tracemalloc | None)."""
+    global _profiler, _memory_snapshot, _capture_state
+    state = _capture_state or {"enabled": _enabled, "memory": False, "started_tracemalloc": False}
+    _capture_state = None
+    stats = None
+    if _profiler is not None:
+        _profiler.disable()
+        stats = pstats.Stats(_profiler)
+        _profiler = None
+    if state["memory"] and tracemalloc.is_tracing():
+        _memory_snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        # tracemalloc, запущенный вызывающим кодом, оставляем работать
+        if state["started_tracemalloc"]:
+            tracemalloc.stop()
+        with _lock:
+            _counters["tracemalloc.current_bytes"] = current
+            _counters["tracemalloc.peak_bytes"] = peak
+    if not state["enabled"]:
+        disable()
+    return stats, _memory_snapshot
+
+
+@contextmanager
+def capture(memory=True):
+    """Контекст с cProfile/tracemalloc; результат доступен как словарь после выхода."""
+    result = {}
+    start_capture(memory)
+    try:
+        yield result
+    finally:
+        result["stats"], result["memory"] = stop_capture()
+
+
+def to_chrome_trace():
+    """Собирает события и счётчики в структуру формата Chrome trace."""
+    trace_events = events()
+    timestamp = time.perf_counter_ns() / 1000
+    for name, value in sorted(counters().items()):
+        trace_events.append({
+            "name": name,
+            "ph": "C",
+            "ts": timestamp,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": {"value": value},
+        })
+    return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+
+def dump(path):
+    """Записывает trace в JSON-файл path."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(to_chrome_trace(), f)
+
+
+def dump_memory(path, limit=25):
+    """Записывает самые крупные места выделения памяти из последнего снимка tracemalloc."""
+    if _memory_snapshot is None:
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        for stat in _memory_snapshot.statistics("lineno")[:limit]:
+            f.write(f"{stat}\n")
+
+
+def _dump_at_exit(trace_path, profile):
+    if profile:
+        stats, _ = stop_capture()
+        if stats is not None:
+            stats.dump_stats(trace_path + ".prof")
+        dump_memory(trace_path + ".memory.txt")
+    dump(trace_path)
+
+
+def _configure_from_environment():
+    trace_path = os.environ.get("INSTRUMENTATION_TRACE")
+    if not trace_path:
+        return
+    profile = os.environ.get("INSTRUMENTATION_PROFILE", "") not in ("", "0")
+    if profile:
+        start_capture()
+    else:
+        enable()
+    atexit.register(_dump_at_exit, trace_path, profile)
+
+
+_configure_from_environment()
@@ -0,0 +1,106 @@
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+import dz_instrumentation as instrumentation
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        instrumentation.reset()
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+
+    def test_disabled_records_nothing(self):
+        instrumentation.disable()
+        with instrumentation.span("work"):
+            pass
+        instrumentation.count("calls")
+        self.assertEqual(instrumentation.events(), [])
+        self.assertEqual(instrumentation.counters(), {})
+
+    def test_span_and_counter(self):
+        instrumentation.enable()
+        with instrumentation.span("work", item="a"):
+            instrumentation.count("calls")
+            instrumentation.count("calls", 2)
+
+        events = instrumentation.events()
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["name"], "work")
+        self.assertEqual(events[0]["ph"], "X")
+        self.assertEqual(events[0]["args"], {"item": "a"})
+        self.assertGreaterEqual(events[0]["dur"], 0)
+        self.assertEqual(instrumentation.counters(), {"calls": 3})
+
+    def test_traced_marks_errors(self):
+        @instrumentation.traced("failing")
+        def failing():
+            raise ValueError("boom")
+
+        instrumentation.enable()
+        with self.assertRaises(ValueError):
+            failing()
+        self.assertEqual(instrumentation.events()[0]["args"], {"error": "ValueError"})
+
+    def test_dump_chrome_trace(self):
+        instrumentation.enable()
+        with instrumentation.span("work"):
+            instrumentation.count("calls")
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "trace.json")
+            instrumentation.dump(path)
+            with open(path, encoding="utf-8") as f:
+                trace = json.load(f)
+
+        phases = sorted(event["ph"] for event in trace["traceEvents"])
+        self.assertEqual(phases, ["C", "X"])
+
+    def test_capture(self):
+        with instrumentation.capture() as result:
+            sum(range(1000))
+        self.assertIsNotNone(result["stats"])
+        self.assertIsNotNone(result["memory"])
+        self.assertIn("tracemalloc.peak_bytes", instrumentation.counters())
+
+    def test_capture_restores_state(self):
+        instrumentation.disable()
+        with instrumentation.capture():
+            self.assertTrue(instrumentation.is_enabled())
+        self.assertFalse(instrumentation.is_enabled())
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_capture_keeps_callers_tracemalloc(self):
+        tracemalloc.start()
+        try:
+            with instrumentation.capture() as result:
+                pass
+            self.assertTrue(tracemalloc.is_tracing())
+            self.assertIsNotNone(result["memory"])
+        finally:
+            tracemalloc.stop()
+
+    def test_capture_without_memory_drops_old_snapshot(self):
+        with instrumentation.capture() as first:
+            pass
+        with instrumentation.capture(memory=False) as second:
+            pass
+        self.assertIsNotNone(first["memory"])
+        self.assertIsNone(second["memory"])
+
+    def test_nested_start_capture_stops_tracemalloc(self):
+        instrumentation.start_capture(memory=False)
+        instrumentation.start_capture(memory=True)
+        self.assertTrue(tracemalloc.is_tracing())
+        _, snapshot = instrumentation.stop_capture()
+        self.assertIsNotNone(snapshot)
+        self.assertFalse(tracemalloc.is_tracing())
+
+
+if __name__ == "__main__":
+    unittest.main()
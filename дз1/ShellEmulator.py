@@ -1,9 +1,17 @@
 import os
+import re
 import sys
+import mmap
+import shlex
 import configparser
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 import rarfile
 
+# Общий модуль замеров лежит в корне репозитория
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dz_instrumentation as instrumentation
 
 
 def handle_ls(current_dir):
@@ -56,6 +64,7 @@ def handle_mv(command, current_dir):
 def handle_tree(current_dir):
     tree_structure = ""
     for root, dirs, files in os.walk(current_dir):
+        instrumentation.count("tree.directories")
         indent = ' ' * 4 * (root.count(os.sep) - current_dir.count(os.sep))
         tree_structure += f"{indent}{os.path.basename(root)}/\n"
         for file in files:
@@ -63,13 +72,164 @@ def handle_tree(current_dir):
     return tree_structure
 
 
+def _resolve(current_dir, name):
+    path = os.path.join(current_dir, name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Файл {name} не найден.")
+    return path
+
+
+@contextmanager
+def _mapped(path):
+    """Отображает файл path в память только для чтения; для пустого файла отдаёт b""."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+def handle_cat(command, current_dir):
+    args = shlex.split(command)[1:]
+    if not args:
+        raise ValueError("Команда cat требует аргумент: имя файла.")
+    output = []
+    for name in args:
+        path = _resolve(current_dir, name)
+        if os.path.isdir(path):
+            raise IsADirectoryError(f"{name} является директорией.")
+        with _mapped(path) as data:
+            output.append(str(data, "utf-8", "replace"))
+    return "".join(output)
+
+
+def handle_head(command, current_dir):
+    args = shlex.split(command)[1:]
+    lines = 10
+    if len(args) == 3 and args[0] == "-n":
+        lines = int(args[1])
+        args = args[2:]
+    if len(args) != 1:
+        raise ValueError("Команда head требует аргумент: [-n число] имя файла.")
+    path = _resolve(current_dir, args[0])
+    with _mapped(path) as data:
+        # Ищем конец N-й строки прямо в отображении, не читая остаток файла
+        end = 0
+        for _ in range(lines):
+            end = data.find(b"\n", end)
+            if end == -1:
+                end = len(data)
+                break
+            end += 1
+        return data[:end].decode("utf-8", errors="replace")
+
+
+# С какого числа файлов grep запускает пул процессов: на маленьких
+# поддеревьях запуск процессов дороже самого поиска
+GREP_PARALLEL_THRESHOLD = 64
+
+
+def _grep_file(path, pattern):
+    """Возвращает строки файла path, в которых найден pattern (bytes-regex)."""
+    matches = []
+    with _mapped(path) as data:
+        position = 0
+        while True:
+            match = pattern.search(data, position)
+            if match is None:
+                break
+            # Пустое совпадение после завершающего '\n' — это не строка файла
+            if match.start() == len(data) and data[-1:] in (b"", b"\n"):
+                break
+            start = data.rfind(b"\n", 0, match.start()) + 1
+            end = data.find(b"\n", match.end())
+            if end == -1:
+                end = len(data)
+            matches.append(data[start:end].decode("utf-8", errors="replace"))
+            position = end + 1
+            if position > len(data):
+                break
+    return matches
+
+
+def _grep_entry(path, pattern):
+    """Ищет pattern в одном файле поддерева: возвращает (строки, None) или
+    ([], текст ошибки), чтобы один нечитаемый файл не прерывал весь поиск.
+    """
+    try:
+        return _grep_file(path, pattern), None
+    except OSError as e:
+        return [], e.strerror or str(e)
+
+
+def handle_grep(command, current_dir):
+    args = shlex.split(command)[1:]
+    if len(args) not in (1, 2):
+        raise ValueError("Команда grep требует аргументы: шаблон [путь].")
+    pattern = re.compile(args[0].encode("utf-8"), re.MULTILINE)
+    target = _resolve(current_dir, args[1]) if len(args) == 2 else current_dir
+
+    if os.path.isfile(target):
+        return "\n".join(_grep_file(target, pattern))
+
+    paths = []
+    for root, dirs, files in os.walk(target):
+        dirs.sort()
+        paths.extend(os.path.join(root, file) for file in sorted(files))
+
+    if len(paths) < GREP_PARALLEL_THRESHOLD:
+        results = [_grep_entry(path, pattern) for path in paths]
+    else:
+        # re.search держит GIL, поэтому файлы разбираются в отдельных процессах;
+        # каждый процесс сам отображает свой файл в память. Порядок вывода сохраняется
+        workers = os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_grep_entry, paths, [pattern] * len(paths),
+                                        chunksize=max(1, len(paths) // (workers * 4))))
+
+    output = []
+    for path, (matches, error) in zip(paths, results):
+        relative = os.path.relpath(path, current_dir)
+        if error is not None:
+            output.append(f"grep: {relative}: {error}")
+        output.extend(f"{relative}:{line}" for line in matches)
+    return "\n".join(output)
+
+
+def _disk_usage(path, current_dir, output):
+    """Суммирует размеры по метаданным (stat), не читая содержимое файлов."""
+    total = 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                total += _disk_usage(entry.path, current_dir, output)
+            else:
+                total += entry.stat(follow_symlinks=False).st_size
+    output.append(f"{total}\t{os.path.relpath(path, current_dir)}")
+    return total
+
+
+def handle_du(command, current_dir):
+    args = shlex.split(command)[1:]
+    if len(args) > 1:
+        raise ValueError("Команда du принимает не более одного аргумента: путь.")
+    target = _resolve(current_dir, args[0]) if args else current_dir
+    if not os.path.isdir(target):
+        return f"{os.path.getsize(target)}\t{os.path.relpath(target, current_dir)}"
+    output = []
+    _disk_usage(target, current_dir, output)
+    return "\n".join(output)
+
+
 def shell_emulator(user, fs_archive, log_file, startup_script=None):
     extract_path = Path("C:/tmp/virtual_fs").as_posix()
     os.makedirs(extract_path, exist_ok=True)  # Создаем путь, если его нет
 
     if fs_archive.endswith('.rar'):
-        with rarfile.RarFile(fs_archive) as archive:
-            archive.extractall(extract_path)
+        with instrumentation.span("rarfile.extractall", archive=fs_archive):
+            with rarfile.RarFile(fs_archive) as archive:
+                archive.extractall(extract_path)
     else:
         print("Ошибка: Поддерживается только формат .rar.")
         sys.exit(1)
@@ -86,6 +246,11 @@ def shell_emulator(user, fs_archive, log_file, startup_script=None):
         current_dir = process_command(command, user, current_dir, log_data)
 
 def process_command(command, user, current_dir, log_data):
+    with instrumentation.span("process_command", command=command.split(" ", 1)[0]):
+        return _process_command(command, user, current_dir, log_data)
+
+
+def _process_command(command, user, current_dir, log_data):
     try:
         if command.startswith("ls"):
             output = handle_ls(current_dir)
@@ -102,6 +267,18 @@ def process_command(command, user, current_dir, log_data):
         elif command.startswith("tree"):
             output = handle_tree(current_dir)
             print(output)
+        elif command.startswith("cat"):
+            output = handle_cat(command, current_dir)
+            print(output)
+        elif command.startswith("head"):
+            output = handle_head(command, current_dir)
+            print(output)
+        elif command.startswith("grep"):
+            output = handle_grep(command, current_dir)
+            print(output)
+        elif command.startswith("du"):
+            output = handle_du(command, current_dir)
+            print(output)
         else:
             output = "Неизвестная команда."
             print(output)
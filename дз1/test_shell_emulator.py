@@ -1,6 +1,8 @@
 import pytest
 import os
-from ShellEmulator import handle_ls, handle_cd, handle_pwd, handle_mv, handle_tree
+import ShellEmulator
+from ShellEmulator import (handle_ls, handle_cd, handle_pwd, handle_mv, handle_tree,
+                           handle_cat, handle_head, handle_grep, handle_du)
 
 def test_handle_ls(tmpdir):
     test_dir = tmpdir.mkdir("test")
@@ -37,3 +39,71 @@ def test_handle_tree(tmpdir):
     tree_output = handle_tree(str(root))
     assert "subdir/" in tree_output
     assert "file.txt" in tree_output
+
+def test_handle_cat(tmpdir):
+    test_dir = tmpdir.mkdir("test")
+    test_dir.join("log.txt").write("line1\nline2\n")
+    test_dir.join("empty.txt").write("")
+    assert handle_cat("cat log.txt", str(test_dir)) == "line1\nline2\n"
+    assert handle_cat("cat empty.txt", str(test_dir)) == ""
+
+def test_handle_head(tmpdir):
+    test_dir = tmpdir.mkdir("test")
+    test_dir.join("log.txt").write("".join(f"line{i}\n" for i in range(20)))
+    assert handle_head("head -n 2 log.txt", str(test_dir)) == "line0\nline1\n"
+    assert handle_head("head log.txt", str(test_dir)).count("\n") == 10
+
+def test_handle_grep(tmpdir):
+    root = tmpdir.mkdir("root")
+    root.join("a.log").write("ok\nERROR disk full\n")
+    root.mkdir("sub").join("b.log").write("ERROR timeout\nok")
+    output = handle_grep("grep ERROR", str(root))
+    assert output.splitlines() == ["a.log:ERROR disk full", os.path.join("sub", "b.log") + ":ERROR timeout"]
+    assert handle_grep("grep ok a.log", str(root)) == "ok"
+
+def test_handle_grep_parallel(tmpdir, monkeypatch):
+    monkeypatch.setattr(ShellEmulator, "GREP_PARALLEL_THRESHOLD", 2)
+    root = tmpdir.mkdir("root")
+    for i in range(4):
+        root.join(f"{i}.log").write(f"ok\nERROR {i}\n")
+    output = handle_grep("grep ERROR", str(root))
+    assert output.splitlines() == [f"{i}.log:ERROR {i}" for i in range(4)]
+
+def test_grep_empty_pattern(tmpdir):
+    test_dir = tmpdir.mkdir("test")
+    test_dir.join("log.txt").write("a\nb\n")
+    test_dir.join("tail.txt").write("a\nb")
+    assert handle_grep("grep '' log.txt", str(test_dir)).splitlines() == ["a", "b"]
+    assert handle_grep("grep '' tail.txt", str(test_dir)).splitlines() == ["a", "b"]
+
+def test_grep_skips_unreadable_file(tmpdir, monkeypatch):
+    test_dir = tmpdir.mkdir("test")
+    test_dir.join("a.txt").write("error\n")
+    # Висячая ссылка попадает в обход, но открыть её нельзя
+    os.symlink(str(test_dir.join("missing")), str(test_dir.join("broken.txt")))
+    test_dir.join("c.txt").write("error\n")
+    expected = ["a.txt:error", "grep: broken.txt: No such file or directory", "c.txt:error"]
+    assert handle_grep("grep error", str(test_dir)).splitlines() == expected
+    monkeypatch.setattr(ShellEmulator, "GREP_PARALLEL_THRESHOLD", 2)
+    assert handle_grep("grep error", str(test_dir)).splitlines() == expected
+
+def test_handle_du(tmpdir):
+    root = tmpdir.mkdir("root")
+    root.join("a.txt").write("12345")
+    root.mkdir("sub").join("b.txt").write("123")
+    lines = handle_du("du", str(root)).splitlines()
+    assert lines[-1] == "8\t."
+    assert "3\tsub" in lines
+
+def test_process_command_emits_span(tmpdir):
+    import dz_instrumentation
+    dz_instrumentation.reset()
+    dz_instrumentation.enable()
+    try:
+        ShellEmulator.process_command("pwd", "user", str(tmpdir), [])
+        events = dz_instrumentation.events()
+    finally:
+        dz_instrumentation.disable()
+        dz_instrumentation.reset()
+    assert [event["name"] for event in events] == ["process_command"]
+    assert events[0]["args"] == {"command": "pwd"}
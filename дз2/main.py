@@ -1,7 +1,12 @@
 import subprocess
 import os
+import sys
 from typing import Dict, Set
 
+# Общий модуль замеров лежит в корне репозитория
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dz_instrumentation as instrumentation
+
 
 class DependencyVisualizer:
     def __init__(self, package_name: str, max_depth: int, plantuml_path: str):
@@ -10,6 +15,7 @@ class DependencyVisualizer:
         self.plantuml_path = plantuml_path
         self.dependencies = {}  # type: Dict[str, Set[str]]
 
+    @instrumentation.traced("DependencyVisualizer.get_dependencies")
     def get_dependencies(self, package: str, depth: int = 0) -> Set[str]:
         """Рекурсивный сбор зависимостей для пакета."""
         if depth >= self.max_depth:
@@ -19,7 +25,9 @@ class DependencyVisualizer:
             return self.dependencies[package]
 
         print(f"Получаем зависимости для пакета {package}...")
-        result = subprocess.run(['apk', 'info', '-R', package], capture_output=True, text=True)
+        instrumentation.count("apk.calls")
+        with instrumentation.span("apk info -R", package=package):
+            result = subprocess.run(['apk', 'info', '-R', package], capture_output=True, text=True)
         if result.returncode != 0:
             print(f"Ошибка при выполнении команды для пакета {package}: {result.stderr}")
             return set()
@@ -69,13 +77,16 @@ class DependencyVisualizer:
 
         return puml_code
 
+    @instrumentation.traced("DependencyVisualizer.visualize")
     def visualize(self):
         """Визуализация графа зависимостей с помощью PlantUML."""
-        puml_code = self.generate_puml_tree(self.package_name)
+        with instrumentation.span("generate_puml_tree"):
+            puml_code = self.generate_puml_tree(self.package_name)
         with open("output.puml", "w") as f:
             f.write(f"@startuml\n{puml_code}@enduml")
 
-        subprocess.run(['java', '-jar', self.plantuml_path, "output.puml"])
+        with instrumentation.span("plantuml"):
+            subprocess.run(['java', '-jar', self.plantuml_path, "output.puml"])
         os.remove("output.puml")
 
 
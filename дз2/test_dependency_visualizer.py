@@ -32,6 +32,25 @@ class TestDependencyVisualizer(unittest.TestCase):
         expected = {"libA", "libB", "libC"}
         self.assertEqual(dependencies, expected, "Должны корректно возвращаться все зависимости.")
 
+    @patch("subprocess.run")
+    def test_get_dependencies_emits_spans(self, mock_subprocess_run):
+        import dz_instrumentation
+        mock_subprocess_run.return_value.stdout = "depends on:\n"
+        mock_subprocess_run.return_value.returncode = 0
+
+        dz_instrumentation.reset()
+        dz_instrumentation.enable()
+        try:
+            DependencyVisualizer("testpkg", max_depth=2, plantuml_path="/path/to/plantuml.jar").get_dependencies("testpkg")
+            names = [event["name"] for event in dz_instrumentation.events()]
+            counters = dz_instrumentation.counters()
+        finally:
+            dz_instrumentation.disable()
+            dz_instrumentation.reset()
+
+        self.assertEqual(names, ["apk info -R", "DependencyVisualizer.get_dependencies"])
+        self.assertEqual(counters, {"apk.calls": 1})
+
     def test_generate_puml_tree_no_dependencies(self):
         visualizer = DependencyVisualizer("testpkg", max_depth=2, plantuml_path="/path/to/plantuml.jar")
         visualizer.dependencies = {"testpkg": set()}  # Имитируем отсутствие зависимостей
@@ -1,21 +1,27 @@
 import unittest
 import subprocess
 import sys
+import os
+import json
+import tempfile
+
+from toml_to_custom import ConfigProcessor
 
 class TestTomlToCustom(unittest.TestCase):
     def setUp(self):
         self.script = 'toml_to_custom.py'
         self.maxDiff = None  # Для полного отображения различий в больших строках
 
-    def run_script(self, input_text):
+    def run_script(self, input_text, *args, env=None):
         """Запускает скрипт с предоставленным входным текстом и захватывает вывод."""
         process = subprocess.Popen(
-            [sys.executable, self.script],  # Используем sys.executable для правильного интерпретатора
+            [sys.executable, self.script, *args],  # Используем sys.executable для правильного интерпретатора
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True,
-            encoding='utf-8'
+            encoding='utf-8',
+            env=env
         )
         stdout, stderr = process.communicate(input_text)
         return stdout.strip(), stderr.strip(), process.returncode
@@ -216,5 +222,207 @@ result = "|max(x + 10, y)|"
         self.assertEqual(returncode, 0, msg=stderr)
         self.assertEqual(stdout, expected_output)
 
+    def test_array_of_tables_with_expressions(self):
+        input_toml = '''
+let base = 8000
+
+[[servers]]
+name = "a"
+port = "|base + 1|"
+
+[[servers]]
+name = "b"
+port = "|base + 1|"
+
+[[servers]]
+name = "c"
+port = "|base - 1|"
+'''
+        expected_output = '''[
+  servers => [
+    [
+      name => "a",
+      port => 8001,
+    ],
+    [
+      name => "b",
+      port => 8001,
+    ],
+    [
+      name => "c",
+      port => 7999,
+    ],
+  ],
+]'''
+        stdout, stderr, returncode = self.run_script(input_toml)
+        self.assertEqual(returncode, 0, msg=stderr)
+        self.assertEqual(stdout, expected_output)
+
+    def test_array_of_tables_error_position(self):
+        input_toml = '''
+[[servers]]
+port = 1
+
+[[servers]]
+port = "|missing + 1|"
+'''
+        stdout, stderr, returncode = self.run_script(input_toml)
+        self.assertNotEqual(returncode, 0)
+        self.assertIn("<stdin>:6:1: Неизвестная переменная 'missing'", stderr)
+
+    def test_redefined_constant_in_expression(self):
+        input_toml = '''
+let x = 1
+let a = |x + 1|
+let x = 10
+let b = |x + 1|
+
+[data]
+a = "|a|"
+b = "|b|"
+c = "|x + 1|"
+'''
+        expected_output = '''[
+  data:
+    a => 2,
+    b => 11,
+    c => 11,
+]'''
+        stdout, stderr, returncode = self.run_script(input_toml)
+        self.assertEqual(returncode, 0, msg=stderr)
+        self.assertEqual(stdout, expected_output)
+
+    def test_error_position_after_comments_and_constants(self):
+        input_toml = '''let x = 10
+{-
+комментарий
+-}
+[data]
+value = "|x - y|"
+'''
+        stdout, stderr, returncode = self.run_script(input_toml)
+        self.assertNotEqual(returncode, 0)
+        self.assertIn("<stdin>:6:1: Неизвестная переменная 'y'", stderr)
+
+    def test_toml_error_position(self):
+        input_toml = '''let x = 1
+{- комментарий -}
+[data]
+value =
+'''
+        stdout, stderr, returncode = self.run_script(input_toml)
+        self.assertNotEqual(returncode, 0)
+        self.assertIn("<stdin>:4:1:", stderr)
+
+    def test_let_error_position(self):
+        input_toml = '''
+let x = |y + 1|
+'''
+        stdout, stderr, returncode = self.run_script(input_toml)
+        self.assertNotEqual(returncode, 0)
+        self.assertIn("<stdin>:2:9: Неизвестная переменная 'y'", stderr)
+
+    def test_collect_all_errors(self):
+        input_toml = '''
+[data]
+a = "|unknown + 1|"
+b = true
+123invalid = "test"
+'''
+        stdout, stderr, returncode = self.run_script(input_toml, "--all-errors")
+        self.assertNotEqual(returncode, 0)
+        self.assertEqual(stdout, "")
+        self.assertIn("<stdin>:3:1: Неизвестная переменная 'unknown'", stderr)
+        self.assertIn("<stdin>:4:1: Ошибка: Неподдерживаемый тип значения 'True'.", stderr)
+        self.assertIn("<stdin>:5:1: Ошибка: Некорректное имя '123invalid'.", stderr)
+
+    def test_error_position_skips_multiline_values(self):
+        input_toml = '''[a]
+s = """
+b = 1
+"""
+b = "|zz|"
+'''
+        stdout, stderr, returncode = self.run_script(input_toml)
+        self.assertNotEqual(returncode, 0)
+        self.assertIn("<stdin>:5:1: Неизвестная переменная 'zz'", stderr)
+
+        input_toml = '''[a]
+items = [
+  1,
+]
+b = "|zz|"
+'''
+        stdout, stderr, returncode = self.run_script(input_toml)
+        self.assertNotEqual(returncode, 0)
+        self.assertIn("<stdin>:5:1: Неизвестная переменная 'zz'", stderr)
+
+    def test_error_position_with_quoted_dotted_keys(self):
+        input_toml = '''
+[a."b.c"]
+z = 1
+'''
+        stdout, stderr, returncode = self.run_script(input_toml)
+        self.assertNotEqual(returncode, 0)
+        self.assertIn("<stdin>:2:2: Ошибка: Некорректное имя 'b.c'.", stderr)
+
+        input_toml = '''
+[a]
+x = 1
+b."c.d".e = 2
+'''
+        stdout, stderr, returncode = self.run_script(input_toml)
+        self.assertNotEqual(returncode, 0)
+        self.assertIn("<stdin>:4:1: Ошибка: Некорректное имя 'c.d'.", stderr)
+
+    def test_instrumentation_trace(self):
+        input_toml = '''
+let x = 1
+
+[data]
+value = "|x + 1|"
+'''
+        with tempfile.TemporaryDirectory() as tmpdir:
+            trace_path = os.path.join(tmpdir, "trace.json")
+            env = dict(os.environ, INSTRUMENTATION_TRACE=trace_path)
+            stdout, stderr, returncode = self.run_script(input_toml, env=env)
+            self.assertEqual(returncode, 0, msg=stderr)
+            with open(trace_path, encoding='utf-8') as f:
+                names = {event["name"] for event in json.load(f)["traceEvents"]}
+        self.assertTrue({"ConfigProcessor.preprocess", "toml.loads", "ConfigProcessor.parse_toml",
+                         "ConfigProcessor.evaluate_expression"} <= names)
+
+    def test_array_of_tables_evaluates_expression_once_per_column(self):
+        servers = ''.join(f'''
+[[servers]]
+name = "s{i}"
+port = "|base + 1|"
+admin = "|base + 2|"
+''' for i in range(5))
+        input_toml = "let base = 8000\n" + servers
+        with tempfile.TemporaryDirectory() as tmpdir:
+            trace_path = os.path.join(tmpdir, "trace.json")
+            env = dict(os.environ, INSTRUMENTATION_TRACE=trace_path)
+            stdout, stderr, returncode = self.run_script(input_toml, env=env)
+            self.assertEqual(returncode, 0, msg=stderr)
+            with open(trace_path, encoding='utf-8') as f:
+                events = [event for event in json.load(f)["traceEvents"]
+                          if event["name"] == "ConfigProcessor.evaluate_expression"]
+        # По одному вычислению на столбцы port и admin
+        self.assertEqual(len(events), 2)
+        self.assertEqual(stdout.count("port => 8001,"), 5)
+        self.assertEqual(stdout.count("admin => 8002,"), 5)
+
+    def test_expression_cache_follows_constants(self):
+        processor = ConfigProcessor()
+        processor.constants['x'] = 1
+        self.assertEqual(processor.evaluate_expression('|x + 1|'), 2)
+
+        processor.constants['x'] = 2
+        self.assertEqual(processor.evaluate_expression('|x + 1|'), 3)
+
+        processor.constants = {'x': 3}
+        self.assertEqual(processor.evaluate_expression('|x + 1|'), 4)
+
 if __name__ == '__main__':
     unittest.main()
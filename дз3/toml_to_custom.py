@@ -1,11 +1,132 @@
 import sys
+import os
+import argparse
+import bisect
 import toml
 import re
 import ast
 
+# Общий модуль замеров лежит в корне репозитория
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dz_instrumentation as instrumentation
+
 # Регулярные выражения для синтаксических элементов
 IDENTIFIER_REGEX = r"^[_a-z]+$"
 MULTILINE_COMMENT_REGEX = r"\{\-.*?\-\}"
+LET_REGEX = re.compile(r"let\s+([_a-z]+)\s*=\s*(.+)")
+# Для однопроходной предобработки: комментарий либо конец строки
+COMMENT_OR_NEWLINE_REGEX = re.compile(MULTILINE_COMMENT_REGEX + r"|\n", re.DOTALL)
+NEWLINE_REGEX = re.compile(r"\n")
+# Для поиска позиций ключей в тексте после предобработки
+TABLE_HEADER_REGEX = re.compile(r"\s*(\[\[?)\s*([^\]]+?)\s*\]")
+KEY_REGEX = re.compile(r"\s*([^\s=\[#][^=]*?)\s*=")
+# Часть составного ключа: строка в кавычках или голое имя, затем точка или конец
+DOTTED_KEY_PART_REGEX = re.compile(r"""\s*("(?:[^"\\]|\\.)*"|'[^']*'|[^.\s"']+)\s*(?:\.|$)""")
+
+
+def _split_dotted_key(key):
+    """Разбивает составной ключ по точкам вне кавычек и снимает кавычки с частей."""
+    parts = []
+    for match in DOTTED_KEY_PART_REGEX.finditer(key):
+        part = match.group(1)
+        parts.append(part[1:-1] if part[0] in "\"'" else part)
+    return tuple(parts)
+
+
+def _continuation_state(line, multiline, depth):
+    """Продолжает разбор строки line для индекса ключей.
+
+    multiline — открытый разделитель многострочной строки (три двойные
+    или три одинарные кавычки) или None, depth — глубина открытых скобок
+    [] и {}. Возвращает то же после конца строки: пока строка или скобка
+    не закрыта, следующие строки не являются заголовками таблиц или ключами.
+    """
+    i = 0
+    n = len(line)
+    while i < n:
+        if multiline:
+            end = line.find(multiline, i)
+            if end == -1:
+                return multiline, depth
+            i = end + 3
+            multiline = None
+            continue
+        char = line[i]
+        if char == "#":
+            break
+        if line.startswith('"""', i) or line.startswith("'''", i):
+            multiline = line[i:i + 3]
+            i += 3
+        elif char in "\"'":
+            i += 1
+            while i < n and line[i] != char:
+                i += 2 if char == '"' and line[i] == "\\" else 1
+            i += 1
+        else:
+            if char in "[{":
+                depth += 1
+            elif char in "]}":
+                depth -= 1
+            i += 1
+    return multiline, depth
+
+
+class ConfigError(ValueError):
+    """Ошибка трансляции с указанием файла, строки и столбца."""
+
+    def __init__(self, message, filename=None, line=None, column=None, path=None):
+        super().__init__(message)
+        self.message = message
+        self.filename = filename
+        self.line = line
+        self.column = column
+        self.path = path
+
+    def __str__(self):
+        location = ":".join(str(part) for part in (self.filename, self.line, self.column) if part is not None)
+        return f"{location}: {self.message}" if location else self.message
+
+
+class SourceMap:
+    """Компактное отображение смещений текста после предобработки в исходный текст.
+
+    Хранится по одной записи на каждый непрерывный фрагмент исходника,
+    попавший в результат, а не по записи на символ.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self._stripped_starts = []
+        self._source_starts = []
+        self._line_starts = None
+        self._length = 0
+
+    def append(self, source_start, length):
+        """Регистрирует фрагмент исходника длины length, дописанный в результат."""
+        if length <= 0:
+            return
+        if self._source_starts and \
+                self._source_starts[-1] + (self._length - self._stripped_starts[-1]) == source_start:
+            # Фрагмент продолжает предыдущий — новая запись не нужна
+            self._length += length
+            return
+        self._stripped_starts.append(self._length)
+        self._source_starts.append(source_start)
+        self._length += length
+
+    def to_source(self, offset):
+        """Переводит смещение в тексте после предобработки в смещение исходника."""
+        if not self._stripped_starts:
+            return offset
+        index = max(bisect.bisect_right(self._stripped_starts, offset) - 1, 0)
+        return self._source_starts[index] + offset - self._stripped_starts[index]
+
+    def position(self, source_offset):
+        """Возвращает (строка, столбец) смещения исходника, нумерация с 1."""
+        if self._line_starts is None:
+            self._line_starts = [0] + [match.end() for match in NEWLINE_REGEX.finditer(self.source)]
+        index = bisect.bisect_right(self._line_starts, source_offset) - 1
+        return index + 1, source_offset - self._line_starts[index] + 1
 
 class SafeEvaluator(ast.NodeVisitor):
     """Безопасный вычислитель выражений."""
@@ -52,17 +173,237 @@ class SafeEvaluator(ast.NodeVisitor):
         else:
             raise ValueError(f"Неизвестная переменная '{node.id}'")
 
+
+class Constants(dict):
+    """Словарь констант, который считает свои изменения в version.
+
+    По version кэш выражений узнаёт, что константы поменялись,
+    в том числе при записи в обход let.
+    """
+    version = 0
+
+    def __setitem__(self, key, value):
+        self.version += 1
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.version += 1
+        super().__delitem__(key)
+
+    def __ior__(self, other):
+        self.version += 1
+        return super().__ior__(other)
+
+    def update(self, *args, **kwargs):
+        self.version += 1
+        super().update(*args, **kwargs)
+
+    def setdefault(self, key, default=None):
+        self.version += 1
+        return super().setdefault(key, default)
+
+    def pop(self, *args):
+        self.version += 1
+        return super().pop(*args)
+
+    def popitem(self):
+        self.version += 1
+        return super().popitem()
+
+    def clear(self):
+        self.version += 1
+        super().clear()
+
+
 class ConfigProcessor:
-    def __init__(self):
+    def __init__(self, filename=None, collect_errors=False):
         self.constants = {}
+        # Результаты выражений по их тексту; зависят только от констант,
+        # поэтому действительны, пока не изменилась версия self.constants
+        self._expression_cache = {}
+        self.filename = filename
+        # В режиме collect_errors ошибки накапливаются в self.errors вместо исключения
+        self.collect_errors = collect_errors
+        self.errors = []
+        self.source_map = None
+        self._stripped_text = None
+        self._key_offsets = None
+
+    @property
+    def constants(self):
+        return self._constants
+
+    @constants.setter
+    def constants(self, value):
+        # Новый словарь начинает отсчёт версий заново, поэтому кэш сбрасывается явно
+        self._constants = Constants(value)
+        self._cache_version = None
+
+    def convert(self, text):
+        """Полный цикл трансляции: предобработка, разбор TOML и преобразование."""
+        with instrumentation.span("ConfigProcessor.preprocess"):
+            stripped_text, self.source_map = self.preprocess(text)
+        self._stripped_text = stripped_text
+        self._key_offsets = None
+        try:
+            with instrumentation.span("toml.loads"):
+                toml_data = toml.loads(stripped_text)
+        except toml.TomlDecodeError as e:
+            # Дальше разбирать нечего — TOML не загрузился целиком
+            self._report(ConfigError(e.msg), offset=e.pos)
+            return []
+        return self.parse_toml(toml_data)
+
+    def preprocess(self, text, strip_comments=True):
+        """За один проход удаляет комментарии и объявления констант.
+
+        Возвращает текст для toml.loads и SourceMap для перевода позиций
+        в исходный текст.
+        """
+        source_map = SourceMap(text)
+        pieces = []
+        spans = []
+        previous_newline = None
+        position = 0
+        pattern = COMMENT_OR_NEWLINE_REGEX if strip_comments else NEWLINE_REGEX
+
+        for match in pattern.finditer(text):
+            if match.start() > position:
+                spans.append((position, match.start()))
+            position = match.end()
+            if match.group() != "\n":
+                continue  # Комментарий просто выбрасывается
+            if self._process_line(text, spans, source_map, match.start()):
+                previous_newline = self._emit_line(text, spans, pieces, source_map, previous_newline, match.start())
+            spans = []
+
+        if position < len(text):
+            spans.append((position, len(text)))
+        if self._process_line(text, spans, source_map, None):
+            self._emit_line(text, spans, pieces, source_map, previous_newline, None)
+        return "".join(pieces), source_map
+
+    @staticmethod
+    def _emit_line(text, spans, pieces, source_map, previous_newline, newline_offset):
+        """Переносит строку в результат, отделяя её '\n' от предыдущей сохранённой."""
+        if previous_newline is not None:
+            pieces.append("\n")
+            source_map.append(previous_newline, 1)
+        for start, end in spans:
+            pieces.append(text[start:end])
+            source_map.append(start, end - start)
+        return newline_offset
+
+    def _process_line(self, text, spans, source_map, newline_offset):
+        """Разбирает логическую строку; возвращает False, если это объявление let.
+
+        newline_offset — позиция завершающего '\n' или None для последней строки.
+        """
+        # '\r\n' приводится к '\n' так же, как раньше делал replace
+        if newline_offset is not None and spans and text[spans[-1][1] - 1] == "\r":
+            start, end = spans[-1]
+            spans[-1] = (start, end - 1)
+        line = "".join(text[start:end] for start, end in spans)
+
+        match = LET_REGEX.match(line.strip())
+        if not match:
+            return True
 
+        name, value = match.groups()
+        value_index = len(line) - len(line.lstrip()) + match.start(2)
+        try:
+            if not re.match(IDENTIFIER_REGEX, name):
+                raise ValueError(f"Ошибка: Некорректное имя константы '{name}'.")
+            if self.is_constant_expression(value.strip()):
+                evaluated_value = self.evaluate_expression(value.strip())
+            else:
+                evaluated_value = self.parse_value(value.strip())
+            self.constants[name] = evaluated_value
+        except ValueError as e:
+            default = len(text) if newline_offset is None else newline_offset
+            self._report(e, source_offset=self._span_offset(spans, value_index, default),
+                         source_map=source_map)
+        return False
+
+    @staticmethod
+    def _span_offset(spans, index, default):
+        """Переводит индекс внутри склеенной строки в смещение исходника."""
+        for start, end in spans:
+            if index < end - start:
+                return start + index
+            index -= end - start
+        return default
+
+    def _locate_key(self, path):
+        """Ищет смещение ключа path в тексте после предобработки.
+
+        Индекс строится лениво, только когда понадобилось сообщить об ошибке.
+        Для ключей внутри встроенных таблиц возвращается позиция ближайшего
+        известного родителя.
+        """
+        if self._stripped_text is None:
+            return None
+        if self._key_offsets is None:
+            self._key_offsets = {}
+            table = ()
+            array_counts = {}
+            offset = 0
+            multiline = None
+            depth = 0
+            for line in self._stripped_text.split("\n"):
+                # Содержимое многострочных строк и массивов ключами не считается
+                continued = multiline is not None or depth > 0
+                multiline, depth = _continuation_state(line, multiline, depth)
+                if continued:
+                    offset += len(line) + 1
+                    continue
+                header = TABLE_HEADER_REGEX.match(line)
+                key = KEY_REGEX.match(line)
+                if header:
+                    table = _split_dotted_key(header.group(2))
+                    if header.group(1) == "[[":
+                        index = array_counts.get(table, 0)
+                        array_counts[table] = index + 1
+                        self._key_offsets.setdefault(table, offset + header.start(2))
+                        table = table + (index,)
+                    self._key_offsets.setdefault(table, offset + header.start(2))
+                elif key:
+                    parts = _split_dotted_key(key.group(1))
+                    # Составной ключ a.b.c задаёт и промежуточные таблицы a и a.b
+                    for length in range(1, len(parts) + 1):
+                        self._key_offsets.setdefault(table + parts[:length], offset + key.start(1))
+                offset += len(line) + 1
+        for length in range(len(path), 0, -1):
+            if path[:length] in self._key_offsets:
+                return self._key_offsets[path[:length]]
+        return None
+
+    def _report(self, error, path=(), offset=None, source_offset=None, source_map=None):
+        """Дополняет ошибку позицией и либо выбрасывает её, либо накапливает."""
+        if not (isinstance(error, ConfigError) and error.path is not None):
+            message = error.message if isinstance(error, ConfigError) else str(error)
+            source_map = source_map or self.source_map
+            if source_offset is None:
+                if offset is None:
+                    offset = self._locate_key(path)
+                if offset is not None and source_map is not None:
+                    source_offset = source_map.to_source(offset)
+            line = column = None
+            if source_offset is not None and source_map is not None:
+                line, column = source_map.position(source_offset)
+            error = ConfigError(message, self.filename, line, column, path)
+        if not self.collect_errors:
+            raise error
+        self.errors.append(error)
+
+    @instrumentation.traced("ConfigProcessor.parse_toml")
     def parse_toml(self, toml_data):
         """Парсит TOML и преобразует в пользовательский формат."""
         if not isinstance(toml_data, dict):
             raise ValueError("Ошибка: Входные данные должны быть словарем.")
         return self.process_dict(toml_data)
 
-    def process_dict(self, data, depth=0):
+    def process_dict(self, data, depth=0, path=()):
         """Обрабатывает словарь и преобразует его в нужный формат."""
         result = []
         indent = "  " * depth
@@ -73,37 +414,105 @@ class ConfigProcessor:
 
         for key, value in data.items():
             key = key.strip()
-            if not re.match(IDENTIFIER_REGEX, key):
-                raise ValueError(f"Ошибка: Некорректное имя '{key}'.")
-
-            if isinstance(value, dict):
-                result.append(f"{indent}  {key}:")
-                # Рекурсивно обрабатываем вложенный словарь без добавления дополнительных скобок
-                result.extend(self.process_dict(value, depth + 1))
-            elif isinstance(value, list):
-                result.append(f"{indent}  {key} => [")
-                for item in value:
-                    if isinstance(item, (int, float, str)):
-                        result.append(f"{indent}    {self.format_value(item)},")
-                    elif isinstance(item, dict):
-                        result.append(f"{indent}    [")
-                        # Передаем depth +2 для корректной индентации вложенных словарей
-                        result.extend(self.process_dict(item, depth + 2))
-                        result.append(f"{indent}    ],")
+            key_path = path + (key,)
+            try:
+                self.validate_key(key)
+
+                if isinstance(value, dict):
+                    lines = [f"{indent}  {key}:"]
+                    # Рекурсивно обрабатываем вложенный словарь без добавления дополнительных скобок
+                    lines.extend(self.process_dict(value, depth + 1, key_path))
+                elif isinstance(value, list):
+                    lines = [f"{indent}  {key} => ["]
+                    table_lines = self.process_table_array(value, depth)
+                    if table_lines is not None:
+                        lines.extend(table_lines)
                     else:
-                        raise ValueError(f"Ошибка: Неподдерживаемый тип в списке '{item}'.")
-                result.append(f"{indent}  ],")
-            else:
-                if isinstance(value, str) and self.is_constant_expression(value):
-                    evaluated_value = self.evaluate_expression(value)
-                    result.append(f"{indent}  {key} => {self.format_value(evaluated_value)},")
+                        for index, item in enumerate(value):
+                            try:
+                                if isinstance(item, (int, float, str)):
+                                    lines.append(f"{indent}    {self.format_value(item)},")
+                                elif isinstance(item, dict):
+                                    lines.append(f"{indent}    [")
+                                    # Передаем depth +2 для корректной индентации вложенных словарей
+                                    lines.extend(self.process_dict(item, depth + 2, key_path + (index,)))
+                                    lines.append(f"{indent}    ],")
+                                else:
+                                    raise ValueError(f"Ошибка: Неподдерживаемый тип в списке '{item}'.")
+                            except ValueError as e:
+                                self._report(e, key_path + (index,))
+                    lines.append(f"{indent}  ],")
                 else:
-                    result.append(f"{indent}  {key} => {self.format_value(value)},")
+                    lines = [self.format_field(indent, key, self.format_scalar(value))]
+            except ValueError as e:
+                self._report(e, key_path)
+                continue
+            result.extend(lines)
         # Добавляем закрывающую скобку ']' только на верхнем уровне
         if depth == 0:
             result.append(f"{indent}]")
         return result
 
+    def process_table_array(self, items, depth):
+        """Обрабатывает однородный массив таблиц по столбцам.
+
+        Массив однородный, если все элементы — таблицы с одинаковыми ключами
+        в одном порядке и скалярными значениями. Ключ столбца проверяется один
+        раз, каждое различное значение столбца форматируется один раз. Возвращает
+        None, если массив не однородный или в нём есть ошибка: тогда его
+        обрабатывает общий путь process_dict с обычными сообщениями об ошибках.
+        """
+        if len(items) < 2 or not isinstance(items[0], dict) or not items[0]:
+            return None
+        keys = tuple(items[0])
+        if any(not isinstance(item, dict) or tuple(item) != keys for item in items):
+            return None
+
+        indent = "  " * depth
+        field_indent = "  " * (depth + 2)
+        columns = []
+        try:
+            for key in keys:
+                name = key.strip()
+                self.validate_key(name)
+                # Тип входит в ключ, чтобы 1 и 1.0 не склеились
+                formatted = {}
+                column = []
+                for item in items:
+                    value = item[key]
+                    if type(value) not in (str, int, float):
+                        return None
+                    text = formatted.get((type(value), value))
+                    if text is None:
+                        text = self.format_scalar(value)
+                        formatted[type(value), value] = text
+                    column.append(self.format_field(field_indent, name, text))
+                columns.append(column)
+        except ValueError:
+            return None
+
+        lines = []
+        for row in zip(*columns):
+            lines.append(f"{indent}    [")
+            lines.extend(row)
+            lines.append(f"{indent}    ],")
+        return lines
+
+    def validate_key(self, key):
+        """Проверяет имя ключа (уже без пробелов по краям)."""
+        if not re.match(IDENTIFIER_REGEX, key):
+            raise ValueError(f"Ошибка: Некорректное имя '{key}'.")
+
+    def format_field(self, indent, key, text):
+        """Собирает строку поля 'key => значение,' с отступом indent."""
+        return f"{indent}  {key} => {text},"
+
+    def format_scalar(self, value):
+        """Форматирует скалярное значение поля, вычисляя выражение в | |."""
+        if isinstance(value, str) and self.is_constant_expression(value):
+            value = self.evaluate_expression(value)
+        return self.format_value(value)
+
     def format_value(self, value):
         """Форматирует значения (строки, числа, словари)."""
         if isinstance(value, bool):
@@ -119,16 +528,28 @@ class ConfigProcessor:
         """Проверяет, является ли строка константным выражением в | |."""
         return isinstance(value, str) and value.startswith('|') and value.endswith('|')
 
+    @instrumentation.traced("ConfigProcessor.evaluate_expression")
     def evaluate_expression(self, expr):
-        """Вычисляет выражение на этапе трансляции."""
+        """Вычисляет выражение на этапе трансляции.
+
+        Одинаковые выражения, например в каждом элементе массива таблиц,
+        вычисляются один раз: результат берётся из кэша.
+        """
+        if self._cache_version != self.constants.version:
+            self._expression_cache.clear()
+            self._cache_version = self.constants.version
+        if expr in self._expression_cache:
+            return self._expression_cache[expr]
         expr_content = expr.strip("|")
         try:
             # Парсим выражение
             node = ast.parse(expr_content, mode='eval')
             evaluator = SafeEvaluator(self.constants)
-            return evaluator.visit(node.body)
+            value = evaluator.visit(node.body)
         except Exception as e:
-            raise ValueError(f"{e}")
+            raise ConfigError(f"{e}")
+        self._expression_cache[expr] = value
+        return value
 
     def process_multiline_comments(self, text):
         """Удаляет многострочные комментарии из текста."""
@@ -136,23 +557,8 @@ class ConfigProcessor:
 
     def process_let_statements(self, text):
         """Обрабатывает объявления констант и сохраняет их."""
-        let_pattern = re.compile(r"let\s+([_a-z]+)\s*=\s*(.+)")
-        lines = text.replace('\r\n', '\n').split('\n')
-        new_lines = []
-        for line in lines:
-            match = let_pattern.match(line.strip())
-            if match:
-                name, value = match.groups()
-                if not re.match(IDENTIFIER_REGEX, name):
-                    raise ValueError(f"Ошибка: Некорректное имя константы '{name}'.")
-                if self.is_constant_expression(value.strip()):
-                    evaluated_value = self.evaluate_expression(value.strip())
-                else:
-                    evaluated_value = self.parse_value(value.strip())
-                self.constants[name] = evaluated_value
-            else:
-                new_lines.append(line)
-        return '\n'.join(new_lines)
+        new_text, _ = self.preprocess(text, strip_comments=False)
+        return new_text
 
     def parse_value(self, value):
         """Парсит значение из строки в соответствующий тип."""
@@ -164,24 +570,31 @@ class ConfigProcessor:
         elif value.startswith('"') and value.endswith('"'):
             return value.strip('"')
         else:
-            raise ValueError(f"Ошибка: Не удалось распознать значение '{value}'.")
+            raise ConfigError(f"Ошибка: Не удалось распознать значение '{value}'.")
 
 def main():
-    processor = ConfigProcessor()
+    parser = argparse.ArgumentParser(description="Транслятор TOML в учебный конфигурационный язык.")
+    parser.add_argument("path", nargs="?", help="входной файл (по умолчанию стандартный ввод)")
+    parser.add_argument("--all-errors", action="store_true",
+                        help="сообщать обо всех ошибках, а не только о первой")
+    args = parser.parse_args()
 
-    try:
-        toml_input = sys.stdin.read()
-        # Удаляем многострочные комментарии
-        toml_input = processor.process_multiline_comments(toml_input)
+    processor = ConfigProcessor(filename=args.path or "<stdin>", collect_errors=args.all_errors)
 
-        # Обрабатываем объявления констант
-        toml_input = processor.process_let_statements(toml_input)
+    try:
+        if args.path:
+            with open(args.path, encoding="utf-8") as f:
+                toml_input = f.read()
+        else:
+            toml_input = sys.stdin.read()
 
-        # Парсим TOML
-        toml_data = toml.loads(toml_input)
+        # Удаляем комментарии и константы, парсим TOML и преобразуем в пользовательский формат
+        custom_config = processor.convert(toml_input)
 
-        # Преобразуем в пользовательский формат
-        custom_config = processor.parse_toml(toml_data)
+        if processor.errors:
+            for error in processor.errors:
+                print(f"Ошибка: {error}", file=sys.stderr)
+            sys.exit(1)
 
         # Выводим результат
         for line in custom_config: